@@ -0,0 +1,347 @@
+# backend/app/backfill.py
+"""
+Bulk backfill: catch up on page posts/comments the webhook never delivered.
+
+    python -m app.backfill --dry-run            # generate only, print replies
+    python -m app.backfill --max-items 500      # answer for real
+
+Pipeline: fetch (Graph paging) -> generate (ThetaBrain) -> reply (Graph).
+Stages are linked by bounded queues, so memory stays flat on big pages.
+Answered IDs (and permanently failed ones) go to a JSON checkpoint, so a crashed
+run can simply be restarted. Anything we could not check or post for a transient
+reason is left out of it and retried next run.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from app.core.config import settings
+from app.services.brain import brain, FALLBACK_REPLY
+from app.services.facebook import fb_service, GraphError
+from app.services.db import init_db, increment_posts_analyzed
+
+logger = logging.getLogger("theta.backfill")
+
+# Graph error codes that mean "slow down" (app / user / page / custom throttling)
+RATE_LIMIT_CODES = {4, 17, 32, 613}
+# Unknown / service-unavailable: worth another try on the next run
+TRANSIENT_CODES = {1, 2}
+GRAPH_RETRIES = 3
+
+# Nested 'comments' (replies to each comment) usually answers "did we reply?" with
+# no extra request; longer threads are paged through from where the window ends
+FEED_FIELDS = "id,message,from"
+COMMENT_FIELDS = "id,message,from,comments.limit(25){from}"
+
+
+class RateLimiter:
+    """Thread-safe spacing of calls: at most `per_second` calls across all workers."""
+
+    def __init__(self, per_second: float):
+        self.interval = 1.0 / per_second if per_second > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class Checkpoint:
+    """
+    IDs we are done with, persisted as JSON (atomic rewrite).
+    `answered` got a reply; `failed` maps IDs that can never be answered
+    (deleted, no permission, ...) to the Graph error, so reruns skip them.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.answered = set()
+        self.failed = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.answered = set(data.get("answered", []))
+            self.failed = data.get("failed", {})
+            logger.info(f"📌 Resuming: {len(self.answered)} answered, {len(self.failed)} failed permanently")
+
+    def __contains__(self, target_id: str) -> bool:
+        return target_id in self.answered or target_id in self.failed
+
+    # Saved on every mark: a reply is already public by then, so losing it means a duplicate
+    def mark(self, target_id: str):
+        self.answered.add(target_id)
+        self.save()
+
+    def mark_failed(self, target_id: str, reason: str):
+        self.failed[target_id] = reason
+        self.save()
+
+    def save(self):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "answered": sorted(self.answered),
+                "failed": self.failed,
+                "updated_at": int(time.time()),
+            }, f)
+        os.replace(tmp, self.path)
+
+
+class Backfill:
+    def __init__(self, page_id: str, checkpoint: Checkpoint, dry_run: bool = False,
+                 concurrency: int = 4, max_items: int = 0):
+        self.page_id = page_id
+        self.checkpoint = checkpoint
+        self.dry_run = dry_run
+        self.concurrency = max(1, concurrency)
+        self.max_items = max_items
+        self.graph_limit = RateLimiter(settings.GRAPH_MAX_RPS)
+        self.model_limit = RateLimiter(settings.MODEL_MAX_RPM / 60)
+        self.stats = {"queued": 0, "skipped": 0, "generated": 0, "replied": 0, "failed": 0}
+
+    # ── Helpers ──
+
+    @staticmethod
+    def _author(obj: dict) -> str:
+        # Graph omits 'from' for privacy-restricted users
+        return str(obj.get("from", {}).get("id", ""))
+
+    @staticmethod
+    def _backoff(attempt: int, code):
+        backoff = 30 * (attempt + 1)
+        logger.warning(f"⏳ Graph throttled (code {code}), sleeping {backoff}s...")
+        time.sleep(backoff)
+
+    def _walk(self, endpoint: str, fields: str, limit: int = 50, after: str = None):
+        """fb_service.iter_edge that backs off on throttling and resumes from the failed page."""
+        attempt = 0
+        while True:
+            try:
+                for item in fb_service.iter_edge(endpoint, fields=fields, limit=limit, after=after,
+                                                 throttle=self.graph_limit.wait):
+                    attempt = 0
+                    yield item
+                return
+            except GraphError as e:
+                if e.code not in RATE_LIMIT_CODES or attempt == GRAPH_RETRIES - 1:
+                    raise
+                self._backoff(attempt, e.code)
+                after = e.after
+                attempt += 1
+
+    def _page_replied(self, comment_id: str, nested: dict) -> bool:
+        """True if the page already replied in this comment's thread. Raises GraphError if unsure."""
+        if any(self._author(r) == self.page_id for r in nested.get("data", [])):
+            return True
+        paging = nested.get("paging", {})
+        if not paging.get("next"):
+            return False
+        # Thread is longer than the nested window: keep paging, stop at the first hit
+        replies = self._walk(f"{comment_id}/comments", fields="from", limit=100,
+                             after=paging.get("cursors", {}).get("after"))
+        return any(self._author(r) == self.page_id for r in replies)
+
+    def _needs_reply(self, obj: dict, replied) -> bool:
+        """Something a user wrote that we have not answered yet. `replied` is checked lazily."""
+        if self._author(obj) == self.page_id or not obj.get("message"):
+            return False
+        if obj["id"] in self.checkpoint:
+            self.stats["skipped"] += 1
+            return False
+        try:
+            if replied():
+                self.stats["skipped"] += 1
+                return False
+        except GraphError as e:
+            # Can't tell whether we already replied: don't risk a duplicate, retry next run
+            logger.warning(f"⚠️ Skipping {obj['id']}, reply check failed: {e}")
+            self.stats["failed"] += 1
+            return False
+        return True
+
+    def _item(self, obj: dict, context: str) -> dict:
+        return {"target_id": obj["id"], "user_psid": self._author(obj), "context": context}
+
+    def _collect(self, post: dict) -> list:
+        """Builds the work items for one post (runs in a worker thread)."""
+        post_id = post["id"]
+        post_text = post.get("message") or "[Post Content Hidden]"
+        try:
+            comments = list(self._walk(f"{post_id}/comments", fields=COMMENT_FIELDS))
+        except GraphError as e:
+            # Post and comments both depend on this read; retry the whole post next run
+            logger.warning(f"⚠️ Skipping post {post_id}, comments unreadable: {e}")
+            self.stats["failed"] += 1
+            return []
+        items = []
+
+        # Visitor posts are items too; the page answers them with a top-level comment
+        if self._needs_reply(post, lambda: any(self._author(c) == self.page_id for c in comments)):
+            items.append(self._item(post, post_text))
+
+        for c in comments:
+            if self._needs_reply(c, lambda c=c: self._page_replied(c["id"], c.get("comments", {}))):
+                # Same shape as FacebookService.get_comment_context
+                items.append(self._item(c, f"Post Context: {post_text}\nUser Comment: \"{c['message']}\""))
+        return items
+
+    def _full(self) -> bool:
+        return bool(self.max_items) and self.stats["queued"] >= self.max_items
+
+    # ── Stage 1: FETCH ──
+
+    async def _fetch(self, out_q: asyncio.Queue):
+        feed = self._walk(f"{self.page_id}/feed", fields=FEED_FIELDS)
+        try:
+            while not self._full():
+                post = await asyncio.to_thread(next, feed, None)
+                if post is None: break
+                for item in await asyncio.to_thread(self._collect, post):
+                    if self._full(): break
+                    await self._enqueue(out_q, item)
+        except Exception as e:
+            # Stop feeding, but let already-queued items finish (and get checkpointed)
+            logger.error(f"❌ Fetch stage stopped early: {e}")
+            self.stats["failed"] += 1
+        finally:
+            for _ in range(self.concurrency):
+                await out_q.put(None)
+
+    async def _enqueue(self, q: asyncio.Queue, item: dict):
+        self.stats["queued"] += 1
+        await q.put(item)
+
+    # ── Stage 2: GENERATE ──
+
+    def _generate_one(self, context: str) -> str:
+        # The cascade may try several models; each attempt takes its own RPM slot
+        return brain.analyze_and_reply(context, throttle=self.model_limit.wait)
+
+    async def _generate(self, in_q: asyncio.Queue, out_q: asyncio.Queue):
+        while (item := await in_q.get()) is not None:
+            try:
+                reply = await asyncio.to_thread(self._generate_one, item["context"])
+            except Exception as e:
+                logger.error(f"❌ Generate failed for {item['target_id']}: {e}")
+                reply = None
+            if not reply or reply == FALLBACK_REPLY:
+                # Don't post the "brain freeze" text; leave it for the next run
+                logger.warning(f"⚠️ No reply generated for {item['target_id']}")
+                self.stats["failed"] += 1
+                continue
+            self.stats["generated"] += 1
+            item["reply"] = reply
+            await out_q.put(item)
+        await out_q.put(None)
+
+    # ── Stage 3: REPLY ──
+
+    def _reply_one(self, target_id: str, message: str) -> dict:
+        resp = {}
+        for attempt in range(GRAPH_RETRIES):
+            self.graph_limit.wait()
+            resp = fb_service.post_comment(target_id, message)
+            code = resp.get("error", {}).get("code")
+            if code not in RATE_LIMIT_CODES or attempt == GRAPH_RETRIES - 1:
+                break
+            self._backoff(attempt, code)
+        return resp
+
+    @staticmethod
+    def _is_permanent(resp: dict) -> bool:
+        """A Graph error that no retry will fix (deleted target, bad permissions, ...)."""
+        error = resp.get("error")
+        if not error: return False  # network failure: _post returned {}
+        code = error.get("code")
+        return not (error.get("is_transient") or code in RATE_LIMIT_CODES or code in TRANSIENT_CODES)
+
+    def _record_reply(self, target_id: str, resp: dict):
+        if resp and "error" not in resp:
+            # Checkpoint first: the comment is live, so it must never be posted twice
+            self.checkpoint.mark(target_id)
+            self.stats["replied"] += 1
+            logger.info(f"✅ Answered {target_id}")
+            try:
+                increment_posts_analyzed()
+            except Exception as e:
+                logger.error(f"❌ Stats update failed: {e}")
+            return
+
+        self.stats["failed"] += 1
+        if self._is_permanent(resp):
+            error = resp["error"]
+            self.checkpoint.mark_failed(target_id, f"{error.get('code')}: {error.get('message')}")
+
+    async def _reply(self, in_q: asyncio.Queue):
+        while (item := await in_q.get()) is not None:
+            try:
+                if self.dry_run:
+                    print(json.dumps({"target_id": item["target_id"], "reply": item["reply"]}, ensure_ascii=False))
+                    continue
+
+                psid = item["user_psid"]
+                message = f"@[{psid}] {item['reply']}" if psid else item["reply"]
+                resp = await asyncio.to_thread(self._reply_one, item["target_id"], message)
+                self._record_reply(item["target_id"], resp)
+            except Exception as e:
+                # Keep draining the queue, or the generators block on it forever
+                logger.error(f"❌ Reply stage error for {item['target_id']}: {e}")
+                self.stats["failed"] += 1
+
+    # ── Runner ──
+
+    async def run(self) -> dict:
+        # Bounded queues: fetch can't run far ahead of the model
+        gen_q = asyncio.Queue(maxsize=self.concurrency * 2)
+        reply_q = asyncio.Queue(maxsize=self.concurrency * 2)
+
+        generators = [asyncio.create_task(self._generate(gen_q, reply_q)) for _ in range(self.concurrency)]
+        repliers = [asyncio.create_task(self._reply(reply_q)) for _ in range(self.concurrency)]
+        try:
+            await self._fetch(gen_q)
+            await asyncio.gather(*generators)
+            await asyncio.gather(*repliers)
+        finally:
+            # Only matters if we were interrupted; finished tasks ignore cancel()
+            for task in generators + repliers:
+                task.cancel()
+            if not self.dry_run:
+                self.checkpoint.save()
+        return self.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill replies for a page's historical posts and comments.")
+    parser.add_argument("--page-id", default=settings.PAGE_ID, help="Page to scan (default: PAGE_ID)")
+    parser.add_argument("--checkpoint", default="backfill_checkpoint.json", help="Resumable checkpoint file")
+    parser.add_argument("--dry-run", action="store_true", help="Generate replies and print them; post nothing")
+    parser.add_argument("--concurrency", type=int, default=settings.BACKFILL_CONCURRENCY)
+    parser.add_argument("--max-items", type=int, default=0, help="Stop after queueing N items (0 = no limit)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    if not args.page_id:
+        parser.error("No page id: set PAGE_ID or pass --page-id")
+
+    init_db()
+    job = Backfill(
+        page_id=str(args.page_id),
+        checkpoint=Checkpoint(args.checkpoint),
+        dry_run=args.dry_run,
+        concurrency=args.concurrency,
+        max_items=args.max_items,
+    )
+    stats = asyncio.run(job.run())
+    logger.info(f"🏁 Backfill done: {stats}")
+
+
+if __name__ == "__main__":
+    main()
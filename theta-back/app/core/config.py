@@ -20,6 +20,19 @@ class Settings:
     PORT: int = int(os.getenv("PORT", "8000"))
     ENVIRONMENT: str = os.getenv("ENVIRONMENT", "development")
     
+    # Backfill (python -m app.backfill)
+    BACKFILL_CONCURRENCY: int = int(os.getenv("BACKFILL_CONCURRENCY", "4"))
+    GRAPH_MAX_RPS: float = float(os.getenv("GRAPH_MAX_RPS", "5"))
+    MODEL_MAX_RPM: float = float(os.getenv("MODEL_MAX_RPM", "30"))
+
+    # Media (scraped post images -> multimodal prompts)
+    MEDIA_CACHE_DIR: str = os.getenv("MEDIA_CACHE_DIR", "media_cache")
+    MEDIA_CACHE_MAX_MB: int = int(os.getenv("MEDIA_CACHE_MAX_MB", "256"))
+    MEDIA_MAX_IMAGES: int = int(os.getenv("MEDIA_MAX_IMAGES", "4"))
+    MEDIA_MAX_BYTES: int = int(os.getenv("MEDIA_MAX_BYTES", str(8 * 1024 * 1024)))
+    MEDIA_MAX_SIDE: int = int(os.getenv("MEDIA_MAX_SIDE", "1024"))
+    MEDIA_FETCH_TIMEOUT: float = float(os.getenv("MEDIA_FETCH_TIMEOUT", "8"))
+
     # Facebook Graph API URL
     FB_GRAPH_URL: str = "https://graph.facebook.com/v19.0"
 
@@ -1,3 +1,4 @@
+import asyncio
 import json
 import logging
 from fastapi import FastAPI, Request, BackgroundTasks
@@ -5,6 +6,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.services.brain import brain
 from app.services.facebook import fb_service
+from app.services.media import media_service
 from app.services.db import init_db, increment_posts_analyzed, increment_dms_answered, get_stats
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
@@ -105,15 +107,18 @@ async def process_mention(post_id: str, target_id: str, user_psid: str):
     context = fb_service.get_post_context(post_id)
     if not context: return
 
+    # Scraped memes/screenshots: fetch once (cached by hash) and send as inline images
+    images = await asyncio.to_thread(media_service.fetch_images, media_service.extract_image_urls(context))
+
     # 3. 🌟 DECISION: Chat vs Verify?
     # If the user says "verify", "check", or "fact", we use the new Research Tool.
     content_lower = context.lower()
     if any(k in content_lower for k in ["verify", "fact check", "check this", "সত্যতা", "যাচাই"]):
         logger.info("🕵️ Verification Intent Detected")
-        reply_text = brain.verify_post(context)
+        reply_text = brain.verify_post(context, images=images)
     else:
         # Standard witty reply
-        reply_text = brain.analyze_and_reply(context)
+        reply_text = brain.analyze_and_reply(context, images=images)
 
         # 4. ROBUST REPLY STRATEGY
         # Attempt 1: Reply to the Comment (Threaded) - Preferred
@@ -146,6 +151,7 @@ async def process_mention(post_id: str, target_id: str, user_psid: str):
 async def process_comment(post_id: str, comment_id: str, user_psid: str):
     context = fb_service.get_comment_context(comment_id, post_id)
     if not context: return
-    reply = brain.analyze_and_reply(context)
+    images = await asyncio.to_thread(media_service.fetch_images, media_service.extract_image_urls(context))
+    reply = brain.analyze_and_reply(context, images=images)
     fb_service.post_comment(comment_id, f"@[{user_psid}] {reply}")
     increment_posts_analyzed()
\ No newline at end of file
@@ -9,6 +9,9 @@ logger = logging.getLogger("theta.brain")
 
 SIGNATURE = ""
 
+# Returned when every model in the cascade fails (callers can detect it)
+FALLBACK_REPLY = "I'm having a bit of a brain freeze right now. Give me a second! 🧊"
+
 # ✅ PRODUCTION MODEL STACK
 MODELS = [
     "gemma-3-27b-it",  # Primary: High Intelligence
@@ -26,6 +29,12 @@ SYSTEM_INSTRUCTION_TEXT = (
     "5. IDENTITY: You were built by TeraMind (TService Research Lab)."
 )
 
+# MediaService re-encodes every image as JPEG
+IMAGE_MIME_TYPE = "image/jpeg"
+
+# Appended to prompts when post images are attached as inline parts
+IMAGES_NOTE = "The post's images are attached above. Read any text, memes or screenshots in them.\n\n"
+
 
 class ThetaBrain:
     def __init__(self):
@@ -51,29 +60,36 @@ class ThetaBrain:
             return "Search unavailable."
 
     # ── 🌟 NEW: Verification Logic ──
-    def verify_post(self, post_content: str) -> str:
+    def verify_post(self, post_content: str, images: list = None) -> str:
         # 1. SEARCH (The "Hand")
         # We search for the first 60 chars + "fact check" to get relevant hits
         search_query = f"fact check {post_content[:60]}"
         facts = self._search_web(search_query)
 
         # 2. SYNTHESIZE (The "Brain")
-        prompt = (
-            f"Context from Web Search:\n{facts}\n\n"
-            f"User Post: \"{post_content}\"\n\n"
-            f"Task: Verify this post based ONLY on the context above. "
-            f"If it is a conspiracy theory, debunk it gently. "
-            f"Cite the sources using. "
-            f"IMPORTANT: Reply in the SAME LANGUAGE as the User Post."
-        )
+        def build(note: str) -> str:
+            return (
+                f"Context from Web Search:\n{facts}\n\n"
+                f"User Post: \"{post_content}\"\n\n"
+                f"{note}"
+                f"Task: Verify this post based ONLY on the context above. "
+                f"If it is a conspiracy theory, debunk it gently. "
+                f"Cite the sources using. "
+                f"IMPORTANT: Reply in the SAME LANGUAGE as the User Post."
+            )
 
         # We route this strictly to the Cascade logic to handle errors/models
-        return self._cascade(prompt, use_search=False)
+        if not images:
+            return self._cascade(build(""), use_search=False)
+        return self._cascade(build(IMAGES_NOTE), use_search=False, images=images, text_prompt=build(""))
 
     # ── Public Feed ──
-    def analyze_and_reply(self, context: str) -> str:
+    def analyze_and_reply(self, context: str, images: list = None, throttle=None) -> str:
         prompt = f"A user tagged you in this post. Read it and reply as Theta:\n\n{context}"
-        return self._cascade(prompt, use_search=False)
+        if not images:
+            return self._cascade(prompt, use_search=False, throttle=throttle)
+        return self._cascade(f"{prompt}\n\n{IMAGES_NOTE}", use_search=False, images=images,
+                             text_prompt=prompt, throttle=throttle)
 
     # ── Private DM ──
     def chat_reply(self, user_message: str) -> str:
@@ -81,8 +97,15 @@ class ThetaBrain:
         return self._cascade(prompt, use_search=False)
 
     # ── Cascade Logic ──
-    def _cascade(self, prompt: str, use_search: bool) -> str:
+    def _cascade(self, prompt: str, use_search: bool, images: list = None, text_prompt: str = None,
+                 throttle=None) -> str:
+        """
+        `images` are JPEG bytes (see MediaService), sent inline ahead of the prompt.
+        `text_prompt` is the same prompt without the image note, used if the images get rejected.
+        `throttle` is called before every model request (callers with an RPM budget).
+        """
         if not prompt: return "..."
+        rejected = False
 
         for model in MODELS:
             try:
@@ -104,10 +127,16 @@ class ThetaBrain:
                         tools=[self._search_tool] if use_search else None
                     )
 
-                logger.info(f"⚡ Trying {model}...")
+                contents = final_prompt
+                if images:
+                    contents = [types.Part.from_bytes(data=img, mime_type=IMAGE_MIME_TYPE) for img in images]
+                    contents.append(final_prompt)
+
+                if throttle: throttle()
+                logger.info(f"⚡ Trying {model}{f' with {len(images)} image(s)' if images else ''}...")
                 resp = self.client.models.generate_content(
                     model=model,
-                    contents=final_prompt,
+                    contents=contents,
                     config=config,
                 )
                 return resp.text.strip()
@@ -119,6 +148,7 @@ class ThetaBrain:
                 elif "429" in err_str:
                     logger.warning(f"⚠️ {model} Rate Limited.")
                 elif "400" in err_str:
+                    rejected = True
                     logger.error(f"❌ {model} Config Error: {e}")
                 else:
                     logger.error(f"❌ {model} Client Error: {e}")
@@ -127,7 +157,13 @@ class ThetaBrain:
                 logger.error(f"❌ {model} Crash: {e}")
                 continue
 
-        return "I'm having a bit of a brain freeze right now. Give me a second! 🧊"
+        # A model refused the images? A text-only answer beats no answer.
+        # (Not on 429s: retrying straight away would just burn more quota.)
+        if images and rejected and text_prompt:
+            logger.warning("⚠️ Images rejected, retrying text-only")
+            return self._cascade(text_prompt, use_search, throttle=throttle)
+
+        return FALLBACK_REPLY
 
 
 brain = ThetaBrain()
\ No newline at end of file
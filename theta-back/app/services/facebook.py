@@ -8,6 +8,16 @@ from app.core.config import settings
 logger = logging.getLogger("theta.facebook")
 
 
+class GraphError(Exception):
+    """A Graph read failed. `after` is the cursor of the failed page, to resume from."""
+
+    def __init__(self, error: dict, after: str = None):
+        super().__init__(error.get("message", "Graph error"))
+        self.code = error.get("code")
+        self.is_transient = bool(error.get("is_transient"))
+        self.after = after
+
+
 class FacebookService:
     def __init__(self):
         self.base_url = settings.FB_GRAPH_URL
@@ -56,6 +66,32 @@ class FacebookService:
         params = {"fields": fields} if fields else {}
         return self._get(object_id, params=params)
 
+    def iter_edge(self, endpoint: str, fields: str = None, limit: int = 50, after: str = None, throttle=None):
+        """
+        Walks a Graph edge (e.g. '{page}/feed') page by page using cursor pagination.
+        Yields one item at a time. `throttle` is called before every page request.
+        Raises GraphError if a page can't be read, so callers never mistake it for "no items".
+        """
+        while True:
+            if throttle: throttle()
+            params = {"limit": limit}
+            if fields: params["fields"] = fields
+            if after: params["after"] = after
+
+            data = self._get(endpoint, params=params)
+            if "error" in data:
+                logger.error(f"❌ Paging /{endpoint} failed: {data['error'].get('message')}")
+                raise GraphError(data["error"], after=after)
+
+            paging = data.get("paging", {})
+            after = paging.get("cursors", {}).get("after")
+            for item in data.get("data", []):
+                yield item
+
+            # No 'next' link means this was the last page
+            if not paging.get("next") or not after:
+                return
+
     def get_user_profile(self, psid: str) -> dict:
         data = self._get(psid, fields="name,first_name")
         if "error" in data:
@@ -0,0 +1,224 @@
+import hashlib
+import io
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlsplit, parse_qsl, urlencode
+import requests
+from requests.adapters import HTTPAdapter
+from PIL import Image
+from app.core.config import settings
+
+logger = logging.getLogger("theta.media")
+
+# Content images the scraper leaves inside the context string (plain or JSON)
+IMAGE_URL_RE = re.compile(r'https://scontent[^\s"\'<>]+')
+
+CACHE_EXT = ".jpg"
+
+# Per-request signature/expiry params on scontent URLs; everything else (e.g. `stp`,
+# which picks the crop/size rendition) identifies the image and stays in the alias key
+SIGNATURE_PARAMS = {"oh", "oe"}
+
+# Room for several posts' images in flight, so one slow CDN doesn't queue everyone else
+POOL_WORKERS_PER_IMAGE = 4
+
+
+class MediaService:
+    """
+    Fetches post images concurrently and keeps a content-addressed disk cache.
+
+    Layout under MEDIA_CACHE_DIR:
+      blobs/<sha256 of original bytes>.jpg   downscaled JPEG
+      urls/<sha256 of url key>               text file holding the blob hash
+    The url alias lets a viral image skip the download entirely; the blob hash
+    makes sure it is only ever encoded once, even when reposted under a new URL.
+    Both kinds of file count towards MEDIA_CACHE_MAX_MB and share one LRU (mtime = last use).
+    """
+
+    def __init__(self):
+        self.cache_dir = settings.MEDIA_CACHE_DIR
+        self.blob_dir = os.path.join(self.cache_dir, "blobs")
+        self.url_dir = os.path.join(self.cache_dir, "urls")
+
+        self.max_cache_bytes = settings.MEDIA_CACHE_MAX_MB * 1024 * 1024
+        self._lock = threading.Lock()
+        self._cache_bytes = sum(e.stat().st_size for e in self._cache_entries())
+
+        # 🔌 Pooled client: one keep-alive connection per worker to scontent
+        workers = settings.MEDIA_MAX_IMAGES * POOL_WORKERS_PER_IMAGE
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=workers)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+            "Accept": "image/avif,image/webp,image/*,*/*;q=0.8",
+        })
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="media")
+
+    # ── Public ──
+
+    def extract_image_urls(self, context: str) -> list:
+        """Pulls the scraped scontent URLs out of a post/comment context string."""
+        if not context: return []
+        urls = []
+        for url in IMAGE_URL_RE.findall(context):
+            if url not in urls:
+                urls.append(url)
+        return urls
+
+    def fetch_images(self, urls: list) -> list:
+        """
+        Returns downscaled JPEG bytes for the top content images, in order.
+        Images that fail, are too big, or miss the deadline are simply dropped.
+        """
+        urls = (urls or [])[:settings.MEDIA_MAX_IMAGES]
+        if not urls: return []
+
+        futures = [self._pool.submit(self._get_image, url) for url in urls]
+        # Overall cap: a slow CDN must not hold up the reply
+        wait(futures, timeout=settings.MEDIA_FETCH_TIMEOUT)
+
+        images = []
+        for url, fut in zip(urls, futures):
+            if not fut.done():
+                # Drops it if still queued; a running download stops at its own deadline
+                fut.cancel()
+                logger.warning(f"⏱️ Image fetch timed out: {url[:80]}")
+                continue
+            data = fut.result()
+            if data: images.append(data)
+        return images
+
+    # ── Pipeline (runs in pool threads) ──
+
+    def _get_image(self, url: str) -> bytes:
+        try:
+            alias_path = os.path.join(self.url_dir, self._hash(self._url_key(url).encode()))
+
+            # 1. URL seen before? Serve the blob without touching the network
+            digest = self._read_file(alias_path)
+            if digest:
+                data = self._read_file(self._blob_path(digest.decode()))
+                if data: return data
+
+            # 2. Download (capped), then dedupe by content hash
+            raw = self._download(url)
+            if not raw: return b""
+            digest = self._hash(raw)
+
+            data = self._read_file(self._blob_path(digest))
+            if not data:
+                data = self._downscale(raw)
+                self._write_file(self._blob_path(digest), data)
+
+            self._write_file(alias_path, digest.encode())
+            return data
+
+        except Exception as e:
+            logger.error(f"❌ Media error for {url[:80]}: {e}")
+            return b""
+
+    def _download(self, url: str) -> bytes:
+        max_bytes = settings.MEDIA_MAX_BYTES
+        # The requests timeout is per socket read; a trickling CDN needs a total deadline
+        deadline = time.monotonic() + settings.MEDIA_FETCH_TIMEOUT
+        with self.session.get(url, stream=True, timeout=(3, settings.MEDIA_FETCH_TIMEOUT)) as r:
+            if r.status_code != 200 or not r.headers.get("Content-Type", "").startswith("image/"):
+                logger.warning(f"Image fetch failed: {r.status_code} {r.headers.get('Content-Type')}")
+                return b""
+            if int(r.headers.get("Content-Length") or 0) > max_bytes:
+                logger.warning(f"🛑 Image too large ({r.headers['Content-Length']} bytes), skipping")
+                return b""
+
+            buf = io.BytesIO()
+            # Small chunks so the deadline is checked often on slow connections
+            for chunk in r.iter_content(chunk_size=8 * 1024):
+                buf.write(chunk)
+                if buf.tell() > max_bytes:
+                    logger.warning("🛑 Image exceeded size cap mid-download, skipping")
+                    return b""
+                if time.monotonic() > deadline:
+                    logger.warning("⏱️ Image download exceeded deadline, skipping")
+                    return b""
+            return buf.getvalue()
+
+    def _downscale(self, raw: bytes) -> bytes:
+        """Fits the image into MEDIA_MAX_SIDE and re-encodes as JPEG."""
+        with Image.open(io.BytesIO(raw)) as img:
+            img.thumbnail((settings.MEDIA_MAX_SIDE, settings.MEDIA_MAX_SIDE))
+            out = io.BytesIO()
+            img.convert("RGB").save(out, format="JPEG", quality=85, optimize=True)
+            return out.getvalue()
+
+    # ── Cache ──
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.blob_dir, f"{digest}{CACHE_EXT}")
+
+    def _cache_entries(self) -> list:
+        # Directories only appear on the first write
+        return [
+            e for d in (self.blob_dir, self.url_dir) if os.path.isdir(d) for e in os.scandir(d)
+            if e.is_file() and not e.name.endswith(".tmp")
+        ]
+
+    def _read_file(self, path: str) -> bytes:
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # LRU: mark as recently used
+            return data
+        except FileNotFoundError:
+            return b""
+
+    def _write_file(self, path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        with self._lock:
+            # Two workers may store the same new image; only count it once
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp, path)
+            self._cache_bytes += len(data) - old_size
+            if self._cache_bytes > self.max_cache_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Drops least recently used blobs and aliases until the cache is at 90% of its cap."""
+        entries = sorted(self._cache_entries(), key=lambda e: e.stat().st_mtime)
+        target = int(self.max_cache_bytes * 0.9)
+        for e in entries:
+            if self._cache_bytes <= target: break
+            size = e.stat().st_size
+            try:
+                os.remove(e.path)
+                self._cache_bytes -= size
+            except FileNotFoundError:
+                pass
+        # An alias that outlives its blob is just a miss; LRU drops it soon after
+        logger.info(f"🧹 Media cache evicted down to {self._cache_bytes // 1024} KB")
+
+    @staticmethod
+    def _url_key(url: str) -> str:
+        """
+        Path plus rendition params. Drops the host (many scontent-* edges serve the
+        same asset) and the short-lived signature (`oh`, `oe`, `_nc_*`).
+        """
+        parts = urlsplit(url)
+        query = sorted(
+            (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+            if k not in SIGNATURE_PARAMS and not k.startswith("_nc_")
+        )
+        return f"{parts.path}?{urlencode(query)}"
+
+    @staticmethod
+    def _hash(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+
+media_service = MediaService()